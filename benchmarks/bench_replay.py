@@ -0,0 +1,122 @@
+"""Client throughput against replayed API responses, without network access.
+
+Run with `python benchmarks/bench_replay.py [--archive <recorded.jsonl.gz>]`,
+response from tests/assets is replayed if no archive is given.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any
+
+from yarl import URL
+
+from youscan_ir_client.client import YouScanIRClient
+from youscan_ir_client.config import YouScanAPIAddr
+from youscan_ir_client.entities import (
+    AnalysisAttributes,
+    Image,
+    ImageDetectReqParams,
+)
+from youscan_ir_client.transport import (
+    RecordedExchange,
+    ReplayTransport,
+    lognormal_latency,
+)
+
+
+ASSET = Path(__file__).parent.parent / "tests" / "assets" / "response_3_items.json"
+
+
+def default_exchanges() -> list[RecordedExchange]:
+    url = URL(YouScanAPIAddr.base_url) / YouScanAPIAddr.img_detect_endpoint
+    return [
+        RecordedExchange(
+            method="POST",
+            path=url.path,
+            request=None,
+            status=200,
+            response=json.loads(ASSET.read_text()),
+        )
+    ]
+
+
+async def main(
+    archive: Path | None,
+    nr_requests: int,
+    concurrency: int,
+    latency_ms: float,
+    recorded_latency: bool,
+    error_rate: float,
+    retries: int,
+) -> None:
+    replay_kwargs: dict[str, Any] = {
+        "error_rate": error_rate,
+        "recorded_latency": recorded_latency,
+        "seed": 0,
+    }
+    if latency_ms:
+        replay_kwargs["latency"] = lognormal_latency(latency_ms / 1000, 0.5)
+    transport = (
+        ReplayTransport.from_file(archive, **replay_kwargs)
+        if archive
+        else ReplayTransport(default_exchanges(), **replay_kwargs)
+    )
+    params = ImageDetectReqParams(
+        images=[Image(url=f"http://some-nonexisting/{i}.jpg") for i in range(8)],
+        analyse_attributes=list(AnalysisAttributes),
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    # Failed requests are retried immediately, so that backoff does not
+    # hide the client throughput
+    async with YouScanIRClient(
+        "a", "b", transport=transport, retry_delay=lambda _: 0.0
+    ) as client:
+
+        async def _analyse() -> None:
+            nonlocal failed
+            async with semaphore:
+                try:
+                    await client.analyse(params, retries=retries)
+                except Exception:
+                    failed += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(_analyse() for _ in range(nr_requests)))
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"{nr_requests} requests ({failed} failed) in {elapsed:.2f} s, "
+        f"{nr_requests / elapsed:.0f} req/s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--archive", type=Path, default=None)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--recorded-latency", action="store_true")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--retries", type=int, default=3)
+    args = parser.parse_args()
+    # Failures are expected when errors are injected
+    logging.getLogger("youscan_ir_client").setLevel(logging.ERROR)
+    asyncio.run(
+        main(
+            args.archive,
+            args.requests,
+            args.concurrency,
+            args.latency_ms,
+            args.recorded_latency,
+            args.error_rate,
+            args.retries,
+        )
+    )
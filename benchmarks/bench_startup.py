@@ -0,0 +1,134 @@
+"""Import time and first request latency of the client.
+
+Run with `make bench` or `python benchmarks/bench_startup.py`.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+from typing import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+
+from youscan_ir_client.client import YouScanIRClient
+from youscan_ir_client.entities import (
+    AnalysisAttributes,
+    Image,
+    ImageDetectReqParams,
+)
+
+
+IMPORT_STMTS = (
+    "import youscan_ir_client",
+    "import youscan_ir_client.client",
+    "from youscan_ir_client.client import YouScanIRClient; YouScanIRClient('a', 'b')",
+)
+REQ_PARAMS = ImageDetectReqParams(
+    images=[Image(url="http://some-nonexisting/img.jpg")],
+    analyse_attributes=[AnalysisAttributes.TYPE],
+)
+
+
+def measure_import(stmt: str, rounds: int) -> list[float]:
+    # Each round is a fresh interpreter, so nothing is cached in sys.modules
+    code = (
+        "import time; _t = time.perf_counter(); "
+        f"{stmt}; print(time.perf_counter() - _t)"
+    )
+    return [
+        float(subprocess.check_output([sys.executable, "-c", code]))
+        for _ in range(rounds)
+    ]
+
+
+@asynccontextmanager
+async def api_mock(port: int) -> AsyncIterator[str]:
+    async def images_detect(req: web.Request) -> web.Response:
+        req_json = await req.json()
+        return web.json_response(
+            {"results": [{"type": "PHOTO"} for _ in req_json["images"]]}
+        )
+
+    app = web.Application()
+    app.router.add_post("/images/detect", images_detect)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, "localhost", port).start()
+        yield f"http://localhost:{port}"
+    finally:
+        await runner.cleanup()
+
+
+async def measure_first_request(
+    base_url: str,
+    rounds: int,
+    client_factory: Callable[[str], YouScanIRClient],
+) -> list[float]:
+    # Session setup (and warmup, if any) happens on startup,
+    # so only the request itself is measured
+    timings = []
+    for _ in range(rounds):
+        async with client_factory(base_url) as client:
+            start = time.perf_counter()
+            await client.analyse(REQ_PARAMS)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def measure_reentered(base_url: str, rounds: int) -> list[float]:
+    client = YouScanIRClient("a", "b", base_url=base_url, keep_session=True)
+    try:
+        return await measure_first_request(base_url, rounds, lambda _: client)
+    finally:
+        await client.aclose()
+
+
+def report(name: str, timings: list[float]) -> None:
+    print(
+        f"{name:<85} "
+        f"min {min(timings) * 1000:8.2f} ms  "
+        f"median {statistics.median(timings) * 1000:8.2f} ms"
+    )
+
+
+async def main(rounds: int, port: int) -> None:
+    for stmt in IMPORT_STMTS:
+        report(f"import: {stmt}", measure_import(stmt, rounds))
+
+    async with api_mock(port) as base_url:
+        report(
+            "first request: new client",
+            await measure_first_request(
+                base_url,
+                rounds,
+                lambda url: YouScanIRClient("a", "b", base_url=url),
+            ),
+        )
+        report(
+            "first request: new client, warmed up",
+            await measure_first_request(
+                base_url,
+                rounds,
+                lambda url: YouScanIRClient(
+                    "a", "b", base_url=url, warmup_connections=1
+                ),
+            ),
+        )
+        report(
+            "first request: re-entered client",
+            await measure_reentered(base_url, rounds),
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--port", type=int, default=4568)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.port))
@@ -1,38 +1,71 @@
 from __future__ import annotations
 
 import pytest
+import asyncio
 import json
 import logging
 from pathlib import Path
 from aiohttp import web, client_exceptions
-from typing import AsyncIterator, Callable
+from typing import Any, AsyncIterator, Callable
+from yarl import URL
 
 from youscan_ir_client.entities import (
     ImageDetectReqParams,
     Image,
     ImageDetectResponse,
+    ImageAttributesReq,
 )
 from youscan_ir_client.client import YouScanIRClient
-from youscan_ir_client.entities import AnalysisAttributes, ImageAnalysisResult
+from youscan_ir_client.entities import (
+    AnalysisAttributes,
+    ImageAnalysisFailedResult,
+    ImageAnalysisResult,
+)
 from youscan_ir_client.config import YouScanAPIAddr
+from youscan_ir_client.transport import (
+    AiohttpTransport,
+    RecordedExchange,
+    RecordingTransport,
+    ReplayTransport,
+)
 
 
 logging.basicConfig(level=logging.DEBUG)
 
 
 class TestClient:
+    @pytest.fixture
+    def received_payloads(self) -> list[dict[str, Any]]:
+        return []
+
+    @pytest.fixture
+    def used_connections(self) -> set[Any]:
+        # Server side protocol instance is created per accepted connection
+        return set()
+
     @pytest.fixture
     async def youscan_api_mock(
-        self, assets_dir: Path, port: int = 4567
+        self,
+        assets_dir: Path,
+        received_payloads: list[dict[str, Any]],
+        used_connections: set[Any],
+        port: int = 4567,
     ) -> AsyncIterator[str]:
         app = web.Application()
 
+        async def root(req: web.Request) -> web.Response:
+            used_connections.add(req.protocol)
+            # without content length client can not reuse the connection
+            return web.Response(headers={"Content-Length": "0"})
+
         async def images_detect(req: web.Request) -> web.Response:
             one_item = json.loads((assets_dir / "response_1_item.json").read_text())[
                 "results"
             ][0]
 
+            used_connections.add(req.protocol)
             req_json = await req.json()
+            received_payloads.append(req_json)
             nr_requested_imgs = len(req_json["images"])
             return web.json_response(
                 {
@@ -43,6 +76,12 @@ class TestClient:
         async def images_detect_corrupted(req: web.Request) -> web.Response:
             return web.json_response({"reason": "bad response"})
 
+        async def slow(req: web.Request) -> web.Response:
+            await asyncio.sleep(0.3)
+            return web.Response(headers={"Content-Length": "0"})
+
+        app.router.add_route("HEAD", "/", root)
+        app.router.add_route("HEAD", "/slow", slow)
         app.router.add_post("/images/detect", images_detect)
         app.router.add_post("/images/detect_corrupted", images_detect_corrupted)
 
@@ -94,6 +133,340 @@ class TestClient:
         assert len(three_res.results) == 3
         assert all(isinstance(x, ImageAnalysisResult) for x in three_res.results)
 
+    @pytest.mark.asyncio
+    async def test_analyse_per_image(
+        self,
+        client: YouScanIRClient,
+        received_payloads: list[dict[str, Any]],
+    ) -> None:
+        cheap = [AnalysisAttributes.TYPE, AnalysisAttributes.LOGOS]
+        expensive = [AnalysisAttributes.EMBEDDING]
+        requests = [
+            ImageAttributesReq(Image(url="http://some-nonexisting/1.jpg"), cheap),
+            ImageAttributesReq(Image(url="http://some-nonexisting/2.jpg"), expensive),
+            ImageAttributesReq(Image(url="http://some-nonexisting/3.jpg"), cheap[::-1]),
+        ]
+        res = await client.analyse_per_image(requests)
+        assert len(res.results) == 3
+        assert all(isinstance(x, ImageAnalysisResult) for x in res.results)
+
+        assert len(received_payloads) == 2
+        by_attributes = {
+            tuple(x["attributes"]): [img["url"] for img in x["images"]]
+            for x in received_payloads
+        }
+        assert by_attributes == {
+            ("logos", "type"): [
+                "http://some-nonexisting/1.jpg",
+                "http://some-nonexisting/3.jpg",
+            ],
+            ("embedding",): ["http://some-nonexisting/2.jpg"],
+        }
+
+    @pytest.mark.asyncio
+    async def test_analyse_two_phase(
+        self,
+        client: YouScanIRClient,
+        received_payloads: list[dict[str, Any]],
+    ) -> None:
+        params = ImageDetectReqParams(
+            images=[Image(url="http://some-nonexisting/img.jpg")],
+            analyse_attributes=[AnalysisAttributes.TYPE],
+        )
+        followup = [AnalysisAttributes.EMBEDDING]
+
+        res = await client.analyse_two_phase(
+            params, followup, predicate=lambda r: r.type == "VIDEO"
+        )
+        assert len(res.results) == 1
+        assert len(received_payloads) == 1
+
+        res = await client.analyse_two_phase(
+            params, followup, predicate=lambda r: r.type == "PHOTO"
+        )
+        assert len(res.results) == 1
+        assert isinstance(res.results[0], ImageAnalysisResult)
+        assert res.results[0].type == "PHOTO"
+        assert res.results[0].embedding == [-0.3353, 0.6524, -0.2298]
+        assert len(received_payloads) == 3
+        assert received_payloads[-1]["attributes"] == ["embedding"]
+
+    @pytest.mark.asyncio
+    async def test_analyse_two_phase_followup_failed(
+        self,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        path = URL("http://localhost/images/detect").path
+        transport = ReplayTransport(
+            [
+                RecordedExchange(
+                    method="POST",
+                    path=path,
+                    request=None,
+                    status=200,
+                    response={"results": [{"type": "PHOTO"}, {"type": "PHOTO"}]},
+                ),
+                RecordedExchange(
+                    method="POST",
+                    path=path,
+                    request=None,
+                    status=200,
+                    response={
+                        "results": [
+                            {"embedding": [0.1, 0.2]},
+                            {"status": "failed", "Error": "Signature expired"},
+                        ]
+                    },
+                ),
+            ]
+        )
+        params = ImageDetectReqParams(
+            images=[
+                Image(url="http://some-nonexisting/1.jpg"),
+                Image(url="http://some-nonexisting/2.jpg"),
+            ],
+            analyse_attributes=[AnalysisAttributes.TYPE],
+        )
+        async with YouScanIRClient(
+            client_id="client-id",
+            client_secret="client-secret",
+            base_url="http://localhost",
+            transport=transport,
+        ) as client:
+            res = await client.analyse_two_phase(
+                params,
+                [AnalysisAttributes.EMBEDDING],
+                predicate=lambda r: r.type == "PHOTO",
+            )
+
+        first, second = res.results
+        assert isinstance(first, ImageAnalysisResult)
+        assert first.type == "PHOTO"
+        assert first.embedding == [0.1, 0.2]
+        # first phase result is kept, followup failure is reported in logs
+        assert isinstance(second, ImageAnalysisResult)
+        assert second.type == "PHOTO"
+        assert second.embedding == []
+        assert "Followup analysis of image #1" in caplog.text
+        assert "Signature expired" in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_analyse_two_phase_followup_request_failed(
+        self,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        path = URL("http://localhost/images/detect").path
+        transport = ReplayTransport(
+            [
+                RecordedExchange(
+                    method="POST",
+                    path=path,
+                    request=None,
+                    status=200,
+                    response={"results": [{"type": "PHOTO"}]},
+                ),
+                RecordedExchange(
+                    method="POST", path=path, request=None, status=503
+                ),
+            ]
+        )
+        params = ImageDetectReqParams(
+            images=[Image(url="http://some-nonexisting/1.jpg")],
+            analyse_attributes=[AnalysisAttributes.TYPE],
+        )
+        async with YouScanIRClient(
+            client_id="client-id",
+            client_secret="client-secret",
+            base_url="http://localhost",
+            transport=transport,
+        ) as client:
+            res = await client.analyse_two_phase(
+                params,
+                [AnalysisAttributes.EMBEDDING],
+                predicate=lambda r: r.type == "PHOTO",
+                retries=1,
+            )
+
+        [first] = res.results
+        assert isinstance(first, ImageAnalysisResult)
+        assert first.type == "PHOTO"
+        assert first.embedding == []
+        assert "Followup analysis of images [0] failed" in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_analyse_retry_delay(self) -> None:
+        path = URL("http://localhost/images/detect").path
+        transport = ReplayTransport(
+            [
+                RecordedExchange(method="POST", path=path, request=None, status=503),
+                RecordedExchange(
+                    method="POST",
+                    path=path,
+                    request=None,
+                    status=200,
+                    response={"results": [{"type": "PHOTO"}]},
+                ),
+            ]
+        )
+        delays: list[int] = []
+
+        def _retry_delay(attempt: int) -> float:
+            delays.append(attempt)
+            return 0.0
+
+        async with YouScanIRClient(
+            client_id="client-id",
+            client_secret="client-secret",
+            base_url="http://localhost",
+            transport=transport,
+            retry_delay=_retry_delay,
+        ) as client:
+            res = await client.analyse(
+                ImageDetectReqParams(images=[Image(url="http://some/img.jpg")])
+            )
+        assert len(res.results) == 1
+        assert delays == [1]
+
+    @pytest.mark.asyncio
+    async def test_analyse_per_image_group_failed(self) -> None:
+        path = URL("http://localhost/images/detect").path
+        transport = ReplayTransport(
+            [
+                RecordedExchange(
+                    method="POST",
+                    path=path,
+                    request=None,
+                    status=200,
+                    response={"results": [{"type": "PHOTO"}]},
+                ),
+                RecordedExchange(
+                    method="POST", path=path, request=None, status=503
+                ),
+            ]
+        )
+        requests = [
+            ImageAttributesReq(
+                Image(url="http://some-nonexisting/1.jpg"), [AnalysisAttributes.TYPE]
+            ),
+            ImageAttributesReq(
+                Image(url="http://some-nonexisting/2.jpg"),
+                [AnalysisAttributes.EMBEDDING],
+            ),
+        ]
+        async with YouScanIRClient(
+            client_id="client-id",
+            client_secret="client-secret",
+            base_url="http://localhost",
+            transport=transport,
+        ) as client:
+            res = await client.analyse_per_image(requests, retries=1)
+
+        first, second = res.results
+        assert isinstance(first, ImageAnalysisResult)
+        assert first.type == "PHOTO"
+        assert isinstance(second, ImageAnalysisFailedResult)
+        assert second.status == "request_failed"
+        assert "503" in second.error_text
+
+    @pytest.mark.asyncio
+    async def test_keep_session(
+        self,
+        youscan_api_mock: str,
+        analyse_params_factory: Callable[[int], ImageDetectReqParams],
+        used_connections: set[Any],
+    ) -> None:
+        transport = AiohttpTransport()
+        client = YouScanIRClient(
+            client_id="client-id",
+            client_secret="client-secret",
+            base_url=youscan_api_mock,
+            keep_session=True,
+            warmup_connections=2,
+            transport=transport,
+        )
+        try:
+            async with client:
+                session = transport._session
+                assert len(used_connections) == 2
+                await client.analyse(analyse_params_factory(1))
+                # request is sent over one of the warmed up connections
+                assert len(used_connections) == 2
+            assert session and not session.closed
+
+            async with client:
+                assert transport._session is session
+                res = await client.analyse(analyse_params_factory(1))
+                assert len(res.results) == 1
+        finally:
+            await client.aclose()
+        assert session.closed
+
+    @pytest.mark.asyncio
+    async def test_warmup_timeout(
+        self,
+        youscan_api_mock: str,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        async with YouScanIRClient(
+            client_id="client-id",
+            client_secret="client-secret",
+            base_url=f"{youscan_api_mock}/slow",
+            warmup_connections=1,
+            transport=AiohttpTransport(warmup_timeout=0.05),
+        ):
+            pass
+        assert "Connection warmup to" in caplog.text
+
+    def test_keep_session_event_loop_switch(self) -> None:
+        client = YouScanIRClient(
+            client_id="client-id",
+            client_secret="client-secret",
+            keep_session=True,
+        )
+
+        async def _enter() -> None:
+            async with client:
+                pass
+
+        loop = asyncio.new_event_loop()
+        other_loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(_enter())
+            with pytest.raises(RuntimeError, match="call aclose()"):
+                other_loop.run_until_complete(_enter())
+        finally:
+            loop.run_until_complete(client.aclose())
+            loop.close()
+            other_loop.close()
+
+    @pytest.mark.asyncio
+    async def test_record_replay(
+        self,
+        youscan_api_mock: str,
+        analyse_params_factory: Callable[[int], ImageDetectReqParams],
+        tmp_path: Path,
+    ) -> None:
+        recorder = RecordingTransport()
+        async with YouScanIRClient(
+            client_id="client-id",
+            client_secret="client-secret",
+            base_url=youscan_api_mock,
+            transport=recorder,
+        ) as client:
+            recorded = await client.analyse(analyse_params_factory(1))
+        archive = tmp_path / "exchanges.jsonl.gz"
+        recorder.save(archive)
+
+        async with YouScanIRClient(
+            client_id="client-id",
+            client_secret="client-secret",
+            base_url=youscan_api_mock,
+            transport=ReplayTransport.from_file(archive),
+        ) as client:
+            replayed = await client.analyse(analyse_params_factory(3))
+        assert len(replayed.results) == 3
+        assert all(x == recorded.results[0] for x in replayed.results)
+
     @pytest.mark.asyncio
     async def test_analyse_endpoint_corrupted(
         self,
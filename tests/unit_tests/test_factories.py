@@ -114,6 +114,37 @@ class TestEntityFactory:
             ],
         )
 
+    def test_merge_img_analysis_results(
+        self,
+        factory: EntityFactory,
+    ) -> None:
+        first = ImageAnalysisResult(
+            version="2.1",
+            cached=True,
+            cached_attributes=[AnalysisAttributes.TYPE],
+            hash="96e12954da236ade",
+            elapsed=0.5,
+            type="PHOTO",
+        )
+        second = ImageAnalysisResult(
+            version="2.1",
+            cached=False,
+            cached_attributes=[],
+            hash="96e12954da236ade",
+            elapsed=1.0,
+            embedding=[-0.3353, 0.6524, -0.2298],
+        )
+        merged = factory.merge_img_analysis_results(first, second)
+        assert merged == ImageAnalysisResult(
+            version="2.1",
+            cached=False,
+            cached_attributes=[AnalysisAttributes.TYPE],
+            hash="96e12954da236ade",
+            elapsed=1.5,
+            type="PHOTO",
+            embedding=[-0.3353, 0.6524, -0.2298],
+        )
+
     def test_create_detect_response(
         self,
         factory: EntityFactory,
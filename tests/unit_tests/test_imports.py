@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+from youscan_ir_client.entities import Image
+
+
+class TestImports:
+    def test_client_import_is_lazy(
+        self,
+    ) -> None:
+        code = (
+            "import sys; import youscan_ir_client.client; "
+            "print('aiohttp' in sys.modules, 'yarl' in sys.modules)"
+        )
+        out = subprocess.check_output([sys.executable, "-c", code], text=True)
+        assert out.split() == ["False", "False"]
+
+    def test_package_lazy_attrs(
+        self,
+    ) -> None:
+        import youscan_ir_client
+        from youscan_ir_client.client import YouScanIRClient
+
+        assert youscan_ir_client.YouScanIRClient is YouScanIRClient
+        assert youscan_ir_client.Image is Image
+        assert dir(youscan_ir_client).count("YouScanIRClient") == 1
+        with pytest.raises(AttributeError):
+            youscan_ir_client.nonexisting
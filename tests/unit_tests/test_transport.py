@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import gzip
+import json
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Mapping
+
+import pytest
+from aiohttp import ClientResponseError, ClientTimeout, ContentTypeError, RequestInfo
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from youscan_ir_client.client import YouScanIRClient
+from youscan_ir_client.config import YouScanHeaderNames
+from youscan_ir_client.transport import (
+    REDACTED,
+    RecordedExchange,
+    RecordingTransport,
+    ReplayTransport,
+    Transport,
+    TransportResponse,
+    fixed_latency,
+    load_exchanges,
+    save_exchanges,
+)
+
+
+URL_DETECT = URL("http://localhost/api/v2/images/detect")
+
+
+class TestReplayTransport:
+    @pytest.fixture
+    def exchanges(self, assets_dir: Path) -> list[RecordedExchange]:
+        payload = json.loads((assets_dir / "response_3_items.json").read_text())
+        return [
+            RecordedExchange(
+                method="POST",
+                path=URL_DETECT.path,
+                request={"images": [{"url": "http://some/img.jpg"}] * 3},
+                status=200,
+                response=payload,
+            ),
+            RecordedExchange(
+                method="POST",
+                path=URL_DETECT.path,
+                request={"images": [{"url": "http://some/img.jpg"}]},
+                status=503,
+            ),
+        ]
+
+    @pytest.fixture
+    def request_payload(self) -> dict[str, Any]:
+        return {"images": [{"url": "http://some/img.jpg"}] * 5}
+
+    async def test_replay(
+        self,
+        exchanges: list[RecordedExchange],
+        request_payload: dict[str, Any],
+    ) -> None:
+        transport = ReplayTransport(exchanges, latency=fixed_latency(0.001))
+        resp = await transport.request("POST", URL_DETECT, {}, json=request_payload)
+        results = exchanges[0].response["results"]
+        assert resp.status == 200
+        assert resp.payload["results"] == results + results[:2]
+
+        with pytest.raises(ClientResponseError) as exc_info:
+            await transport.request("POST", URL_DETECT, {}, json=request_payload)
+        assert exc_info.value.status == 503
+
+        with pytest.raises(ClientResponseError) as exc_info:
+            await transport.request("GET", URL_DETECT, {})
+        assert exc_info.value.status == 404
+
+    async def test_error_injection(
+        self,
+        exchanges: list[RecordedExchange],
+        request_payload: dict[str, Any],
+    ) -> None:
+        transport = ReplayTransport(
+            exchanges[:1], error_rate=1.0, error_statuses=(429,), seed=0
+        )
+        with pytest.raises(ClientResponseError) as exc_info:
+            await transport.request("POST", URL_DETECT, {}, json=request_payload)
+        assert exc_info.value.status == 429
+
+    async def test_recorded_latency(
+        self,
+        exchanges: list[RecordedExchange],
+        request_payload: dict[str, Any],
+    ) -> None:
+        exchange = replace(exchanges[0], elapsed=0.05)
+        transport = ReplayTransport([exchange], recorded_latency=True)
+        start = time.perf_counter()
+        await transport.request("POST", URL_DETECT, {}, json=request_payload)
+        assert time.perf_counter() - start >= 0.05
+
+
+class TestRecordingTransport:
+    async def test_redaction(self, tmp_path: Path) -> None:
+        exchange = RecordedExchange(
+            method="POST",
+            path=URL_DETECT.path,
+            request=None,
+            status=201,
+            response={"results": [{"type": "PHOTO"}]},
+        )
+        recorder = RecordingTransport(ReplayTransport([exchange]))
+        headers = {
+            YouScanHeaderNames.client_id: "client-id",
+            YouScanHeaderNames.client_secret: "client-secret",
+        }
+        payload = {"images": [{"content": "aGVsbG8="}, {"url": "http://some/img.jpg"}]}
+        await recorder.request("POST", URL_DETECT, headers, json=payload)
+
+        archive = tmp_path / "exchanges.jsonl.gz"
+        recorder.save(archive)
+        content = gzip.decompress(archive.read_bytes())
+        assert b"client-id" not in content
+        assert b"client-secret" not in content
+        [recorded] = load_exchanges(archive)
+        assert recorded.status == 201
+        assert recorded.request["images"] == [
+            {"content": f"{REDACTED}:8"},
+            {"url": "http://some/img.jpg"},
+        ]
+        assert recorded.response == {"results": [{"type": "PHOTO"}] * 2}
+
+    async def test_unparsed_response_not_recorded(self) -> None:
+        class _HTMLTransport(Transport):
+            async def request(
+                self,
+                method: str,
+                url: URL,
+                headers: Mapping[str, str],
+                json: Any = None,
+            ) -> TransportResponse:
+                request_info = RequestInfo(
+                    url, method, CIMultiDictProxy(CIMultiDict()), url
+                )
+                raise ContentTypeError(request_info, (), status=200)
+
+        recorder = RecordingTransport(_HTMLTransport())
+        with pytest.raises(ContentTypeError):
+            await recorder.request("POST", URL_DETECT, {}, json={"images": []})
+        assert recorder.exchanges == []
+
+    def test_timeout_with_inner_transport(self) -> None:
+        inner = RecordingTransport(timeout=ClientTimeout(total=1))
+        with pytest.raises(AssertionError):
+            RecordingTransport(inner, timeout=ClientTimeout(total=1))
+        with pytest.raises(AssertionError):
+            YouScanIRClient("a", "b", timeout=ClientTimeout(total=1), transport=inner)
+
+    def test_save_load(self, tmp_path: Path) -> None:
+        exchanges = [
+            RecordedExchange(
+                method="POST",
+                path=URL_DETECT.path,
+                request={"images": []},
+                status=500,
+                elapsed=0.5,
+            )
+        ]
+        save_exchanges(tmp_path / "exchanges.jsonl.gz", exchanges)
+        assert load_exchanges(tmp_path / "exchanges.jsonl.gz") == exchanges
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .client import YouScanIRClient
+    from .entities import (
+        AnalysisAttributes,
+        Image,
+        ImageAnalysisFailedResult,
+        ImageAnalysisResult,
+        ImageAttributesReq,
+        ImageDetectReqParams,
+        ImageDetectResponse,
+    )
+
+
+# Public names are imported from submodules on first access,
+# so that importing the package itself stays cheap
+_LAZY_ATTRS = {
+    "YouScanIRClient": "client",
+    "AnalysisAttributes": "entities",
+    "Image": "entities",
+    "ImageAnalysisFailedResult": "entities",
+    "ImageAnalysisResult": "entities",
+    "ImageAttributesReq": "entities",
+    "ImageDetectReqParams": "entities",
+    "ImageDetectResponse": "entities",
+}
+
+__all__ = [
+    "YouScanIRClient",
+    "AnalysisAttributes",
+    "Image",
+    "ImageAnalysisFailedResult",
+    "ImageAnalysisResult",
+    "ImageAttributesReq",
+    "ImageDetectReqParams",
+    "ImageDetectResponse",
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{_LAZY_ATTRS[name]}", __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
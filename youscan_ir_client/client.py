@@ -1,54 +1,97 @@
 from __future__ import annotations
 
-from typing import Any, AsyncIterator
+from typing import TYPE_CHECKING, Any, Callable, Sequence
 from types import TracebackType
-from contextlib import asynccontextmanager
 from logging import getLogger
 import uuid
 
 import asyncio
-import aiohttp
-from yarl import URL
 
 from .config import YouScanHeaderNames, YouScanAPIAddr
 from .factories import PayloadFactory, EntityFactory
-from .entities import ImageDetectReqParams, ImageDetectResponse
+from .entities import (
+    AnalysisAttributes,
+    ImageAnalysisFailedResult,
+    ImageAnalysisResult,
+    ImageAttributesReq,
+    ImageDetectReqParams,
+    ImageDetectResponse,
+)
+
+if TYPE_CHECKING:
+    # aiohttp and yarl are imported on first use to keep module import cheap
+    import aiohttp
+    from yarl import URL
+
+    from .transport import Transport
 
 
 LOGGER = getLogger(__name__)
 
 
+def exponential_retry_delay(attempt: int) -> float:
+    return 2**attempt
+
+
 class YouScanIRClient:
+    # Factories are stateless, so they are shared among all client instances
+    _payload_factory = PayloadFactory()
+    _entity_factory = EntityFactory()
+
     def __init__(
         self,
         client_id: str,
         client_secret: str,
         base_url: URL | str | None = None,
-        timeout: aiohttp.ClientTimeout = aiohttp.client.DEFAULT_TIMEOUT,
+        timeout: aiohttp.ClientTimeout | None = None,
+        keep_session: bool = False,
+        warmup_connections: int = 0,
+        transport: Transport | None = None,
+        retry_delay: Callable[[int], float] = exponential_retry_delay,
     ) -> None:
+        # keep_session - HTTP session is not closed on context exit and is reused
+        #   on the next enter within the same event loop, call aclose() explicitly
+        #   before the event loop ends
+        # warmup_connections - nr of connections to establish (DNS + TLS)
+        #   right after the new HTTP session is created
+        # transport - performs HTTP requests, AiohttpTransport with the given
+        #   timeout is used by default
+        # retry_delay - seconds to wait before the next retry of failed request,
+        #   receives the failed attempt number (starting from 1)
+        from yarl import URL
+
         assert client_id, "Client ID was not provided"
         assert client_secret, "Client secret key was not provided"
+        assert warmup_connections >= 0
+        assert timeout is None or transport is None, (
+            "timeout is ignored when a custom transport is given; "
+            "configure the transport instead"
+        )
         self._base_url = URL(base_url) if base_url else URL(YouScanAPIAddr.base_url)
         self._client_id = client_id
         self._client_secret = client_secret
-        self._timeout = timeout
-        self._client: aiohttp.ClientSession | None = None
-        self._payload_factory = PayloadFactory()
-        self._entity_factory = EntityFactory()
+        self._headers = self._create_headers()
+        self._keep_session = keep_session
+        self._warmup_connections = warmup_connections
+        self._retry_delay = retry_delay
+        if transport is None:
+            from .transport import AiohttpTransport
+
+            transport = AiohttpTransport(timeout)
+        self._transport = transport
 
-    @asynccontextmanager
     async def _request(
         self,
         method: str,
         path: str,
-        **kwargs: Any,
-    ) -> AsyncIterator[aiohttp.ClientResponse]:
-        assert self._client
+        json: Any = None,
+    ) -> Any:
         assert self._base_url
         url = self._base_url / path
-        async with self._client.request(method, url, **kwargs) as resp:
-            resp.raise_for_status()
-            yield resp
+        response = await self._transport.request(
+            method, url, self._headers, json=json
+        )
+        return response.payload
 
     def _create_headers(self) -> dict[str, str]:
         headers = {
@@ -62,22 +105,22 @@ class YouScanIRClient:
         params: ImageDetectReqParams,
         retries: int = 3,
     ) -> ImageDetectResponse:
+        import aiohttp
+
         path = YouScanAPIAddr.img_detect_endpoint
         req_payload = self._payload_factory.create_image_detect(params)
+        resp_payload = None
         assert retries >= 1
         for i in range(1, retries + 1):
             try:
                 uid = uuid.uuid1()
                 LOGGER.debug(f"POST >>> {path} ({uid.hex}):\n{req_payload}")
 
-                async with self._request("POST", path, json=req_payload) as response:
-                    resp_payload = await response.json()
-                    LOGGER.debug(f"POST <<< {path} ({uid.hex}):\n{resp_payload}")
+                resp_payload = await self._request("POST", path, json=req_payload)
+                LOGGER.debug(f"POST <<< {path} ({uid.hex}):\n{resp_payload}")
 
-                    resp_entity = self._entity_factory.create_detect_response(
-                        resp_payload
-                    )
-                    return resp_entity
+                resp_entity = self._entity_factory.create_detect_response(resp_payload)
+                return resp_entity
 
             except Exception as e:
                 if isinstance(e, aiohttp.ClientError):
@@ -87,14 +130,125 @@ class YouScanIRClient:
                     LOGGER.warning(resp_payload)
                 if i >= retries:
                     raise
-                sleep = 2**i
+                sleep = self._retry_delay(i)
                 LOGGER.info(f"{i}/{retries} retry in {sleep} sec...")
                 await asyncio.sleep(sleep)
 
         raise RuntimeError("This should not happen")
 
+    @staticmethod
+    def _group_by_attributes(
+        requests: Sequence[ImageAttributesReq],
+    ) -> dict[tuple[AnalysisAttributes, ...], list[int]]:
+        # Attributes are normalized (deduplicated and ordered as in enum),
+        # so that the same set given in different order falls into one group
+        groups: dict[tuple[AnalysisAttributes, ...], list[int]] = {}
+        for i, req in enumerate(requests):
+            requested = set(req.analyse_attributes)
+            key = tuple(x for x in AnalysisAttributes if x in requested)
+            groups.setdefault(key, []).append(i)
+        return groups
+
+    async def analyse_per_image(
+        self,
+        requests: Sequence[ImageAttributesReq],
+        optimize_throughput: bool = False,
+        retries: int = 3,
+    ) -> ImageDetectResponse:
+        # Images of the group, which request failed, get ImageAnalysisFailedResult,
+        # results of other groups are returned as usual
+        groups = self._group_by_attributes(requests)
+        responses = await asyncio.gather(
+            *(
+                self.analyse(
+                    ImageDetectReqParams(
+                        images=[requests[i].image for i in indices],
+                        optimize_throughput=optimize_throughput,
+                        analyse_attributes=attributes,
+                    ),
+                    retries=retries,
+                )
+                for attributes, indices in groups.items()
+            ),
+            return_exceptions=True,
+        )
+
+        results: dict[int, ImageAnalysisResult | ImageAnalysisFailedResult] = {}
+        for indices, response in zip(groups.values(), responses):
+            if isinstance(response, BaseException):
+                if not isinstance(response, Exception):
+                    raise response
+                LOGGER.warning(f"Analyse request failed for images {indices}")
+                failed = self._create_request_failed_result(response)
+                results.update((i, failed) for i in indices)
+                continue
+            assert len(response.results) == len(indices), "Results count mismatch"
+            results.update(zip(indices, response.results))
+        return ImageDetectResponse(results=[results[i] for i in range(len(requests))])
+
+    @staticmethod
+    def _create_request_failed_result(exc: Exception) -> ImageAnalysisFailedResult:
+        return ImageAnalysisFailedResult(
+            status="request_failed",
+            error_text=f"{type(exc).__name__}: {exc}",
+        )
+
+    async def analyse_two_phase(
+        self,
+        params: ImageDetectReqParams,
+        followup_attributes: Sequence[AnalysisAttributes],
+        predicate: Callable[[ImageAnalysisResult], bool],
+        retries: int = 3,
+    ) -> ImageDetectResponse:
+        # Cheap attributes from params are analysed for all images first,
+        # expensive followup ones - only for images matching the predicate.
+        # If the followup analysis fails for an image (or the whole followup
+        # request fails), first phase results are returned as is
+        # (without followup attributes) and the failure is logged
+        first_resp = await self.analyse(params, retries=retries)
+        indices = [
+            i
+            for i, res in enumerate(first_resp.results)
+            if isinstance(res, ImageAnalysisResult) and predicate(res)
+        ]
+        if not indices or not followup_attributes:
+            return first_resp
+
+        followup_params = ImageDetectReqParams(
+            images=[params.images[i] for i in indices],
+            optimize_throughput=params.optimize_throughput,
+            analyse_attributes=followup_attributes,
+        )
+        try:
+            followup_resp = await self.analyse(followup_params, retries=retries)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            LOGGER.warning(f"Followup analysis of images {indices} failed: {e!r}")
+            return first_resp
+        assert len(followup_resp.results) == len(indices), "Results count mismatch"
+
+        results = list(first_resp.results)
+        for i, followup_res in zip(indices, followup_resp.results):
+            first_res = results[i]
+            assert isinstance(first_res, ImageAnalysisResult)
+            if isinstance(followup_res, ImageAnalysisFailedResult):
+                LOGGER.warning(
+                    f"Followup analysis of image #{i} '{params.images[i]}' failed: "
+                    f"{followup_res.status} {followup_res.error_text}"
+                )
+            else:
+                results[i] = self._entity_factory.merge_img_analysis_results(
+                    first_res, followup_res
+                )
+        return ImageDetectResponse(results=results)
+
+    async def warmup(self, connections: int = 1) -> None:
+        await self._transport.warmup(self._base_url, connections)
+
     async def __aenter__(self) -> YouScanIRClient:
-        self._client = await self._create_http_client()
+        if await self._transport.open() and self._warmup_connections:
+            await self.warmup(self._warmup_connections)
         return self
 
     async def __aexit__(
@@ -103,15 +257,8 @@ class YouScanIRClient:
         exc_val: BaseException | None,
         exc_tb: TracebackType | None,
     ) -> None:
-        await self.aclose()
+        if not self._keep_session:
+            await self.aclose()
 
     async def aclose(self) -> None:
-        assert self._client
-        await self._client.close()
-
-    async def _create_http_client(self) -> aiohttp.ClientSession:
-        client = aiohttp.ClientSession(
-            headers=self._create_headers(),
-            timeout=self._timeout,
-        )
-        return await client.__aenter__()
+        await self._transport.aclose()
@@ -36,6 +36,14 @@ class ImageDetectReqParams:
     analyse_attributes: Sequence[AnalysisAttributes] = field(default_factory=tuple)
 
 
+@dataclass(frozen=True)
+class ImageAttributesReq:
+    # Single image with its own set of attributes to analyse.
+    # Images with identical attribute sets are sent within the same request.
+    image: Image
+    analyse_attributes: Sequence[AnalysisAttributes] = field(default_factory=tuple)
+
+
 @dataclass(frozen=True)
 class FoundAttribute:
     label: str
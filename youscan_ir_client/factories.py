@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+from dataclasses import replace
 from typing import Any, Iterable
 
 from .entities import (
@@ -114,6 +115,45 @@ class EntityFactory:
             percentage=payload["percentage"],
         )
 
+    @staticmethod
+    def merge_img_analysis_results(
+        first: ImageAnalysisResult,
+        second: ImageAnalysisResult,
+    ) -> ImageAnalysisResult:
+        # Combines partial results of the same image, analysed for
+        # different attributes within separate requests
+        if first.cached is None or second.cached is None:
+            cached = first.cached if second.cached is None else second.cached
+        else:
+            cached = first.cached and second.cached
+
+        cached_attributes = None
+        if first.cached_attributes is not None or second.cached_attributes is not None:
+            cached_attributes = list(first.cached_attributes or [])
+            cached_attributes += [
+                x for x in second.cached_attributes or [] if x not in cached_attributes
+            ]
+
+        elapsed = None
+        if first.elapsed is not None or second.elapsed is not None:
+            elapsed = (first.elapsed or 0.0) + (second.elapsed or 0.0)
+
+        found_attributes = {
+            attr.value: getattr(second, attr.value)
+            for attr in AnalysisAttributes
+            if getattr(second, attr.value)
+        }
+        return replace(
+            first,
+            version=first.version or second.version,
+            cached=cached,
+            cached_attributes=cached_attributes,
+            hash=first.hash or second.hash,
+            elapsed=elapsed,
+            cache_origin=first.cache_origin or second.cache_origin,
+            **found_attributes,
+        )
+
     @classmethod
     def create_detect_response(cls, payload: dict[str, Any]) -> ImageDetectResponse:
         assert "results" in payload, "'results' field is not in the response"
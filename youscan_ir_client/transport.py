@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import gzip
+import json
+import random
+import time
+from dataclasses import asdict, dataclass
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Mapping, Sequence
+
+if TYPE_CHECKING:
+    import aiohttp
+    from yarl import URL
+
+
+LOGGER = getLogger(__name__)
+
+REDACTED = "<redacted>"
+
+# Draws a latency (in seconds) of a single simulated request
+LatencyDistribution = Callable[[random.Random], float]
+
+
+def fixed_latency(seconds: float) -> LatencyDistribution:
+    return lambda _: seconds
+
+
+def uniform_latency(low: float, high: float) -> LatencyDistribution:
+    return lambda rnd: rnd.uniform(low, high)
+
+
+def lognormal_latency(median: float, sigma: float) -> LatencyDistribution:
+    # Heavy tailed, resembles real-world API latencies
+    return lambda rnd: median * rnd.lognormvariate(0.0, sigma)
+
+
+def create_response_error(
+    method: str,
+    url: URL,
+    status: int,
+    message: str = "",
+) -> aiohttp.ClientResponseError:
+    from aiohttp import ClientResponseError, RequestInfo
+    from multidict import CIMultiDict, CIMultiDictProxy
+
+    request_info = RequestInfo(url, method, CIMultiDictProxy(CIMultiDict()), url)
+    return ClientResponseError(request_info, (), status=status, message=message)
+
+
+@dataclass(frozen=True)
+class TransportResponse:
+    status: int
+    payload: Any = None
+
+
+class Transport(abc.ABC):
+    # Performs HTTP requests for YouScanIRClient.
+    # Returns status and JSON payload of a successful response,
+    # raises aiohttp.ClientResponseError for unsuccessful ones
+    # and other aiohttp.ClientError subclasses for connection failures.
+
+    @abc.abstractmethod
+    async def request(
+        self,
+        method: str,
+        url: URL,
+        headers: Mapping[str, str],
+        json: Any = None,
+    ) -> TransportResponse:
+        pass
+
+    async def open(self) -> bool:
+        # Returns True if new connections pool was created
+        return False
+
+    async def warmup(self, url: URL, connections: int = 1) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+class AiohttpTransport(Transport):
+    def __init__(
+        self,
+        timeout: aiohttp.ClientTimeout | None = None,
+        warmup_timeout: float = 5.0,
+    ) -> None:
+        # warmup_timeout - total timeout (in seconds) of a single warmup request,
+        #   so that unresponsive host does not block the client startup
+        self._timeout = timeout
+        self._warmup_timeout = warmup_timeout
+        self._session: aiohttp.ClientSession | None = None
+        self._session_loop: asyncio.AbstractEventLoop | None = None
+
+    def _is_session_reusable(self) -> bool:
+        return (
+            self._session is not None
+            and not self._session.closed
+            and self._session_loop is asyncio.get_running_loop()
+        )
+
+    async def open(self) -> bool:
+        import aiohttp
+
+        if self._is_session_reusable():
+            return False
+        if self._session is not None and not self._session.closed:
+            # Session kept from the previous event loop can not be used
+            # (nor properly closed) within the current one
+            raise RuntimeError(
+                "HTTP session is bound to another event loop, "
+                "call aclose() before its event loop ends"
+            )
+        session = aiohttp.ClientSession(
+            timeout=self._timeout or aiohttp.client.DEFAULT_TIMEOUT,
+        )
+        self._session = await session.__aenter__()
+        self._session_loop = asyncio.get_running_loop()
+        return True
+
+    async def request(
+        self,
+        method: str,
+        url: URL,
+        headers: Mapping[str, str],
+        json: Any = None,
+    ) -> TransportResponse:
+        assert self._session
+        async with self._session.request(
+            method, url, headers=headers, json=json
+        ) as resp:
+            resp.raise_for_status()
+            return TransportResponse(resp.status, await resp.json())
+
+    async def warmup(self, url: URL, connections: int = 1) -> None:
+        # Establishes connections to the API host, so that they are kept
+        # in the session pool and first requests skip DNS resolving and TLS handshake
+        import aiohttp
+
+        assert self._session
+        session = self._session
+
+        timeout = aiohttp.ClientTimeout(total=self._warmup_timeout)
+
+        async def _connect() -> None:
+            try:
+                async with session.head(url, timeout=timeout) as resp:
+                    await resp.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                LOGGER.warning(f"Connection warmup to '{url}' failed: {e}")
+
+        await asyncio.gather(*(_connect() for _ in range(connections)))
+
+    async def aclose(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+@dataclass(frozen=True)
+class RecordedExchange:
+    # Request headers are not recorded, since they only carry client credentials
+    method: str
+    path: str
+    request: Any
+    status: int
+    response: Any = None
+    elapsed: float = 0.0
+
+
+def redact_payload(payload: Any) -> Any:
+    # Base64-encoded images are replaced with their size
+    if not isinstance(payload, dict) or "images" not in payload:
+        return payload
+    images = [
+        {**img, "content": f"{REDACTED}:{len(img['content'])}"}
+        if "content" in img
+        else img
+        for img in payload["images"]
+    ]
+    return {**payload, "images": images}
+
+
+def save_exchanges(path: Path | str, exchanges: Iterable[RecordedExchange]) -> None:
+    # Gzipped JSON lines, one exchange per line
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for exchange in exchanges:
+            f.write(json.dumps(asdict(exchange), separators=(",", ":")) + "\n")
+
+
+def load_exchanges(path: Path | str) -> list[RecordedExchange]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [RecordedExchange(**json.loads(line)) for line in f if line.strip()]
+
+
+class RecordingTransport(Transport):
+    # Captures request/response pairs passed through the inner transport
+    def __init__(
+        self,
+        inner: Transport | None = None,
+        timeout: aiohttp.ClientTimeout | None = None,
+    ) -> None:
+        # timeout - applied to the default inner AiohttpTransport
+        assert inner is None or timeout is None, (
+            "timeout is ignored when an inner transport is given; "
+            "configure the inner transport instead"
+        )
+        self._inner = inner or AiohttpTransport(timeout)
+        self.exchanges: list[RecordedExchange] = []
+
+    async def open(self) -> bool:
+        return await self._inner.open()
+
+    async def warmup(self, url: URL, connections: int = 1) -> None:
+        await self._inner.warmup(url, connections)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+    async def request(
+        self,
+        method: str,
+        url: URL,
+        headers: Mapping[str, str],
+        json: Any = None,
+    ) -> TransportResponse:
+        import aiohttp
+
+        status: int | None = None
+        payload = None
+        start = time.perf_counter()
+        try:
+            response = await self._inner.request(method, url, headers, json=json)
+            status, payload = response.status, response.payload
+            return response
+        except aiohttp.ContentTypeError:
+            # Responses that failed to parse can not be replayed
+            raise
+        except aiohttp.ClientResponseError as e:
+            status = e.status
+            raise
+        finally:
+            # Connection failures do not have a response to replay
+            if status is not None:
+                self.exchanges.append(
+                    RecordedExchange(
+                        method=method,
+                        path=url.path,
+                        request=redact_payload(json),
+                        status=status,
+                        response=payload,
+                        elapsed=time.perf_counter() - start,
+                    )
+                )
+
+    def save(self, path: Path | str) -> None:
+        save_exchanges(path, self.exchanges)
+
+
+class ReplayTransport(Transport):
+    # Serves recorded responses in-process, without network access.
+    # Exchanges for the same method and path are served in round-robin,
+    # results of images detection are cycled to match the requested images count.
+    def __init__(
+        self,
+        exchanges: Sequence[RecordedExchange],
+        latency: LatencyDistribution | None = None,
+        recorded_latency: bool = False,
+        error_rate: float = 0.0,
+        error_statuses: Sequence[int] = (500,),
+        seed: int | None = None,
+    ) -> None:
+        # latency - None replays at full speed
+        # recorded_latency - replays with latencies observed while recording
+        # error_rate - probability of failing request with one of error_statuses
+        assert exchanges, "No exchanges to replay"
+        assert latency is None or not recorded_latency, (
+            "latency distribution and recorded latency are mutually exclusive"
+        )
+        assert 0.0 <= error_rate <= 1.0
+        assert error_statuses
+        self._exchanges: dict[tuple[str, str], list[RecordedExchange]] = {}
+        for exchange in exchanges:
+            key = (exchange.method, exchange.path)
+            self._exchanges.setdefault(key, []).append(exchange)
+        self._counters = {key: 0 for key in self._exchanges}
+        self._latency = latency
+        self._recorded_latency = recorded_latency
+        self._error_rate = error_rate
+        self._error_statuses = error_statuses
+        self._random = random.Random(seed)
+
+    @classmethod
+    def from_file(cls, path: Path | str, **kwargs: Any) -> ReplayTransport:
+        return cls(load_exchanges(path), **kwargs)
+
+    def _next_exchange(self, method: str, url: URL) -> RecordedExchange:
+        key = (method, url.path)
+        if key not in self._exchanges:
+            raise create_response_error(method, url, 404, "Not recorded")
+        exchanges = self._exchanges[key]
+        exchange = exchanges[self._counters[key] % len(exchanges)]
+        self._counters[key] += 1
+        return exchange
+
+    @staticmethod
+    def _fit_response(response: Any, request: Any) -> Any:
+        if not isinstance(response, dict) or not isinstance(request, dict):
+            return response
+        if not response.get("results") or "images" not in request:
+            return response
+        results = response["results"]
+        nr_images = len(request["images"])
+        return {
+            **response,
+            "results": [results[i % len(results)] for i in range(nr_images)],
+        }
+
+    async def request(
+        self,
+        method: str,
+        url: URL,
+        headers: Mapping[str, str],
+        json: Any = None,
+    ) -> TransportResponse:
+        exchange = self._next_exchange(method, url)
+        if self._latency is not None:
+            await asyncio.sleep(self._latency(self._random))
+        elif self._recorded_latency:
+            await asyncio.sleep(exchange.elapsed)
+        else:
+            # Yields control to other tasks the same way as network IO does
+            await asyncio.sleep(0)
+
+        if self._error_rate and self._random.random() < self._error_rate:
+            status = self._random.choice(self._error_statuses)
+            raise create_response_error(method, url, status, "Injected error")
+
+        if exchange.status >= 400:
+            raise create_response_error(method, url, exchange.status)
+        return TransportResponse(
+            exchange.status, self._fit_response(exchange.response, json)
+        )